@@ -9,11 +9,50 @@ from fitparse.processors import FitFileDataProcessor
 from fitparse.profile import FIELD_TYPE_TIMESTAMP, MESSAGE_TYPES
 from fitparse.records import (
     Crc, DevField, DataMessage, FieldData, FieldDefinition, DevFieldDefinition, DefinitionMessage,
-    MessageHeader, BASE_TYPES, BASE_TYPE_BYTE,
+    MessageHeader, BASE_TYPES_BY_NUM, BASE_TYPE_BYTE,
 )
 from fitparse.utils import fileish_open, is_iterable, FitParseError, FitEOFError, FitCRCError, FitHeaderError
 
 
+def _make_raw_values_reader(field_defs, endian):
+    # Build a (struct, function) pair reading all raw values of a data message
+    # at once; the function turns the unpacked tuple into the list of scrubbed
+    # raw values, with a specialized expression per field. Returns None if a
+    # field can't be read this way (ie, it's smaller than its base type).
+    fmt = [endian]
+    exprs = []
+    namespace = {}
+    index = 0
+    for n, field_def in enumerate(field_defs):
+        base_type = field_def.base_type
+        count = field_def.size // base_type.size
+        if count <= 0:
+            return None
+        fmt.append('%d%s' % (count, base_type.fmt))
+
+        if base_type.name == 'byte':
+            # Byte types are always a single tuple value
+            expr = 'parse_%d(v[%d:%d])' % (n, index, index + count)
+            namespace['parse_%d' % n] = base_type.parse
+        elif base_type.fmt == 's':
+            # Strings unpack to a single bytes object
+            expr = 'parse_%d(v[%d])' % (n, index)
+            namespace['parse_%d' % n] = base_type.parse
+            count = 1
+        elif count > 1:
+            expr = 'parse_%d(v[%d:%d])' % (n, index, index + count)
+            namespace['parse_%d' % n] = base_type.parse_bulk
+        elif base_type.invalid != base_type.invalid:
+            expr = '(None if v[%d] != v[%d] else v[%d])' % (index, index, index)
+        else:
+            expr = '(None if v[%d] == %r else v[%d])' % (index, base_type.invalid, index)
+        exprs.append(expr)
+        index += count
+
+    exec('def read_raw_values(v):\n    return [%s]' % ', '.join(exprs), namespace)
+    return struct.Struct(''.join(fmt)), namespace['read_raw_values']
+
+
 class DeveloperDataMixin:
     def __init__(self, *args, check_developer_data=True, **kwargs):
         self.check_developer_data = check_developer_data
@@ -75,20 +114,24 @@ class DeveloperDataMixin:
             )
             self._append_dev_data_id(dev_data_index)
 
-        fields = self.dev_types[int(dev_data_index)]['fields']
+        fields = self.dev_types[dev_data_index]['fields']
+        base_type = BASE_TYPES_BY_NUM[base_type_id & 0x1F]
+        if base_type is None or base_type.identifier != base_type_id:
+            raise KeyError(base_type_id)
 
         # Note that nothing in the spec says overwriting an existing field is invalid
         fields[field_def_num] = DevField(
             dev_data_index=dev_data_index,
             def_num=field_def_num,
-            type=BASE_TYPES[base_type_id],
+            type=base_type,
             name=field_name,
             units=units,
             native_field_num=native_field_num
         )
 
     def get_dev_type(self, dev_data_index, field_def_num):
-        if dev_data_index not in self.dev_types:
+        dev_type = self.dev_types.get(dev_data_index)
+        if dev_type is None:
             if self.check_developer_data:
                 raise FitParseError(
                     f"No such dev_data_index={dev_data_index} found when looking up field {field_def_num}"
@@ -98,10 +141,10 @@ class DeveloperDataMixin:
                 "Dev type for dev_data_index=%s missing. Adding dummy dev type." % (dev_data_index)
             )
             self._append_dev_data_id(dev_data_index)
+            dev_type = self.dev_types[dev_data_index]
 
-        dev_type = self.dev_types[dev_data_index]
-
-        if field_def_num not in dev_type['fields']:
+        field = dev_type['fields'].get(field_def_num)
+        if field is None:
             if self.check_developer_data:
                 raise FitParseError(
                     f"No such field {field_def_num} for dev_data_index {dev_data_index}"
@@ -114,8 +157,9 @@ class DeveloperDataMixin:
                 dev_data_index=dev_data_index,
                 field_def_num=field_def_num
             )
+            field = dev_type['fields'][field_def_num]
 
-        return dev_type['fields'][field_def_num]
+        return field
 
 
 class FitFileDecoder(DeveloperDataMixin):
@@ -166,7 +210,7 @@ class FitFileDecoder(DeveloperDataMixin):
         self._bytes_left -= len(data)
         return data
 
-    def _read_struct(self, fmt, endian='<', data=None, always_tuple=False):
+    def _read_struct(self, fmt, endian='<', data=None):
         fmt_with_endian = endian + fmt
         size = struct.calcsize(fmt_with_endian)
         if size <= 0:
@@ -177,7 +221,7 @@ class FitFileDecoder(DeveloperDataMixin):
 
         unpacked = struct.unpack(fmt_with_endian, data)
         # Flatten tuple if it's got only one value
-        return unpacked if (len(unpacked) > 1) or always_tuple else unpacked[0]
+        return unpacked if len(unpacked) > 1 else unpacked[0]
 
     def _read_and_assert_crc(self, allow_zero=False):
         # CRC Calculation is little endian from SDK
@@ -202,6 +246,7 @@ class FitFileDecoder(DeveloperDataMixin):
         self._compressed_ts_accumulator = 0
         self._crc = Crc()
         self._local_mesgs = {}
+        self._local_mesg_readers = {}
 
         header_data = self._read(12)
         if header_data[8:12] != b'.FIT':
@@ -291,7 +336,10 @@ class FitFileDecoder(DeveloperDataMixin):
             field_def_num, field_size, base_type_num = self._read_struct('3B', endian=endian)
             # Try to get field from message type (None if unknown)
             field = mesg_type.fields.get(field_def_num) if mesg_type else None
-            base_type = BASE_TYPES.get(base_type_num, BASE_TYPE_BYTE)
+            base_type = BASE_TYPES_BY_NUM[base_type_num & 0x1F]
+            if base_type is None or base_type.identifier != base_type_num:
+                # Not a known identifier, even if its number is
+                base_type = BASE_TYPE_BYTE
 
             if (field_size % base_type.size) != 0:
                 warnings.warn(
@@ -337,32 +385,57 @@ class FitFileDecoder(DeveloperDataMixin):
             dev_field_defs=dev_field_defs,
         )
         self._local_mesgs[header.local_mesg_num] = def_mesg
+        self._local_mesg_readers[header.local_mesg_num] = _make_raw_values_reader(
+            field_defs + dev_field_defs, endian)
         return def_mesg
 
     def _parse_raw_values_from_data_message(self, def_mesg):
+        reader = self._local_mesg_readers.get(def_mesg.header.local_mesg_num)
+        if reader is None:
+            return self._parse_raw_values_by_field(def_mesg)
+
+        record_struct, read_raw_values = reader
+        if not record_struct.size:
+            return []
+        data = self._file.read(record_struct.size)
+        if len(data) != record_struct.size:
+            # File was suddenly terminated, go back and read whichever
+            # fields are complete one at a time
+            self._file.seek(-len(data), os.SEEK_CUR)
+            return self._parse_raw_values_by_field(def_mesg)
+
+        if self.check_crc:
+            self._crc.update(data)
+        self._bytes_left -= len(data)
+        return read_raw_values(record_struct.unpack(data))
+
+    def _parse_raw_values_by_field(self, def_mesg):
         # Go through mesg's field defs and read them
         raw_values = []
         for field_def in def_mesg.field_defs + def_mesg.dev_field_defs:
             base_type = field_def.base_type
             is_byte = base_type.name == 'byte'
+
             # Struct to read n base types (field def size / base type size)
-            struct_fmt = str(int(field_def.size / base_type.size)) + base_type.fmt
+            field_struct = base_type.get_struct(def_mesg.endian, field_def.size // base_type.size)
+            if field_struct.size <= 0:
+                raise FitParseError("Invalid struct format: %s" % field_struct.format)
 
             # Extract the raw value, ask for a tuple if it's a byte type
             try:
-                raw_value = self._read_struct(
-                    struct_fmt, endian=def_mesg.endian, always_tuple=is_byte,
-                )
+                raw_value = field_struct.unpack(self._read(field_struct.size))
             except FitEOFError:
                 # file was suddenly terminated
                 warnings.warn("File was terminated unexpectedly, some data will not be loaded.")
                 break
+            if len(raw_value) == 1 and not is_byte:
+                raw_value = raw_value[0]
 
             # If the field returns with a tuple of values it's definitely an
             # oddball, but we'll parse it on a per-value basis it.
             # If it's a byte type, treat the tuple as a single value
             if isinstance(raw_value, tuple) and not is_byte:
-                raw_value = tuple(base_type.parse(rv) for rv in raw_value)
+                raw_value = base_type.parse_bulk(raw_value)
             else:
                 # Otherwise, just scrub the singular value
                 raw_value = base_type.parse(raw_value)
@@ -34,11 +34,12 @@ class FitFileDataProcessor:
         Returns:
             Scrubbed method name.
         """
-        if method_name not in self._scrubbed_method_names:
-            self._scrubbed_method_names[method_name] = (
+        try:
+            return self._scrubbed_method_names[method_name]
+        except KeyError:
+            scrubbed = self._scrubbed_method_names[method_name] = (
                 scrub_method_name(method_name))
-
-        return self._scrubbed_method_names[method_name]
+            return scrubbed
 
     def run_type_processor(self, field_data):
         self._run_processor(self._scrub_method_name(
@@ -1,25 +1,73 @@
 import math
 import struct
 
-from itertools import zip_longest
+from collections import namedtuple
+from operator import attrgetter
 
 
-class RecordBase:
-    # namedtuple-like base class. Subclasses should must __slots__
-    __slots__ = ()
+def _make_slots_init(slot_names):
+    # Build a straight-line __init__(self, a=None, b=None, ...) assigning each
+    # slot directly, which is much cheaper than a generic setattr() loop.
+    # Private slots (caches) aren't arguments and always start out as None
+    params = [name for name in slot_names if not name.startswith('_')]
+    src = 'def __init__(self, %s):\n' % ', '.join(['%s=None' % name for name in params])
+    src += ''.join([
+        '    self.%s = %s\n' % (name, name if name in params else 'None') for name in slot_names
+    ]) or '    pass\n'
+    namespace = {}
+    exec(src, namespace)
+    return namespace['__init__']
 
-    # TODO: switch back to namedtuple, and don't use default arguments as None
-    #       and see if that gives us any performance improvements
 
-    def __init__(self, *args, **kwargs):
-        for slot_name, value in zip_longest(self.__slots__, args, fillvalue=None):
-            setattr(self, slot_name, value)
-        for slot_name, value in kwargs.items():
-            setattr(self, slot_name, value)
+def _record_tuple(typename, field_names):
+    # namedtuple whose fields all default to None, like RecordBase's slots
+    record = namedtuple(typename, field_names)
+    record.__new__.__defaults__ = (None,) * len(field_names)
+    return record
+
+
+class _NamePool(dict):
+    # Formats names on first use and hands out the same string afterwards,
+    # rather than building a new one on each access
+    def __init__(self, fmt):
+        super().__init__()
+        self.fmt = fmt
+
+    def __missing__(self, key):
+        name = self[key] = self.fmt % key
+        return name
+
 
+# Names of messages and fields not in the profile
+_UNKNOWN_NAMES = _NamePool('unknown_%d')
+_UNKNOWN_DEV_NAMES = _NamePool('unknown_dev_%d_%d')
 
-class MessageHeader(RecordBase):
-    __slots__ = ('is_definition', 'is_developer_data', 'local_mesg_num', 'time_offset')
+
+class RecordBase:
+    # namedtuple-like base class for records that get modified after they're
+    # created (eg. by data processors) or hold lists and dicts, so they keep
+    # identity equality and hashing. Subclasses should must __slots__
+    __slots__ = ()
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        # Include the slots of every base class, so subclasses of records
+        # still accept their parents' arguments
+        slot_names = []
+        for klass in reversed(cls.__mro__):
+            slot_names.extend(klass.__dict__.get('__slots__', ()))
+        cls._init_slots = _make_slots_init(slot_names)
+        cls._init_slots.generated = True
+        # Classes overriding __init__ should call self._init_slots(), and
+        # their subclasses inherit that __init__
+        if '__init__' not in cls.__dict__ and getattr(cls.__init__, 'generated', cls.__init__ is object.__init__):
+            cls.__init__ = cls._init_slots
+
+
+class MessageHeader(_record_tuple(
+    'MessageHeader', ('is_definition', 'is_developer_data', 'local_mesg_num', 'time_offset'),
+)):
+    __slots__ = ()
 
     def __repr__(self):
         return '<MessageHeader: %s%s -- local mesg: #%d%s>' % (
@@ -36,7 +84,7 @@ class DefinitionMessage(RecordBase):
 
     @property
     def name(self):
-        return self.mesg_type.name if self.mesg_type else 'unknown_%d' % self.mesg_num
+        return self.mesg_type.name if self.mesg_type else _UNKNOWN_NAMES[self.mesg_num]
 
     def __repr__(self):
         return '<DefinitionMessage: %s (#%d) -- local mesg: #%d, field defs: [%s], dev field defs: [%s]>' % (
@@ -53,7 +101,7 @@ class FieldDefinition(RecordBase):
 
     @property
     def name(self):
-        return self.field.name if self.field else 'unknown_%d' % self.def_num
+        return self.field.name if self.field else _UNKNOWN_NAMES[self.def_num]
 
     @property
     def type(self):
@@ -72,13 +120,13 @@ class DevFieldDefinition(RecordBase):
     __slots__ = ('field', 'dev_data_index', 'base_type', 'def_num', 'size')
 
     def __init__(self, **kwargs):
-        super().__init__(**kwargs)
+        self._init_slots(**kwargs)
         # For dev fields, the base_type and type are always the same.
         self.base_type = self.type
 
     @property
     def name(self):
-        return self.field.name if self.field else 'unknown_dev_%d_%d' % (self.dev_data_index, self.def_num)
+        return self.field.name if self.field else _UNKNOWN_DEV_NAMES[self.dev_data_index, self.def_num]
 
     @property
     def type(self):
@@ -94,15 +142,34 @@ class DevFieldDefinition(RecordBase):
         )
 
 
+_field_data_name = attrgetter('name')
+
+
 class DataMessage(RecordBase):
-    __slots__ = ('header', 'def_mesg', 'fields')
+    __slots__ = ('header', 'def_mesg', 'fields', '_fields_by_name', '_indexed_fields', '_indexed_len')
     type = 'data'
 
     def get(self, field_name, as_dict=False):
         # SIMPLIFY: get rid of as_dict
-        for field_data in self.fields:
-            if field_data.is_named(field_name):
-                return field_data.as_dict() if as_dict else field_data
+        fields = self.fields
+        # fields may be reassigned, added to or removed from after parsing, so
+        # rebuild the index when the list or its length changes. Replacing a
+        # field in place isn't noticed; reassign fields to do that
+        if self._indexed_fields is not fields or self._indexed_len != len(fields):
+            # Index fields by every name and def_num they can be looked up by,
+            # keeping the first field that matches. This can't be shared across
+            # messages of one definition, since subfields and components vary
+            fields_by_name = {}
+            for field_data in fields:
+                for name in field_data.names:
+                    fields_by_name.setdefault(name, field_data)
+            self._fields_by_name = fields_by_name
+            self._indexed_fields = fields
+            self._indexed_len = len(fields)
+
+        field_data = self._fields_by_name.get(field_name)
+        if field_data:
+            return field_data.as_dict() if as_dict else field_data
 
     def get_raw_value(self, field_name):
         field_data = self.get(field_name)
@@ -118,7 +185,7 @@ class DataMessage(RecordBase):
 
     def get_values(self):
         # SIMPLIFY: get rid of this completely
-        return {f.name if f.name else f.def_num: f.value for f in self.fields}
+        return {f.name or f.def_num: f.value for f in self.fields}
 
     @property
     def name(self):
@@ -142,8 +209,11 @@ class DataMessage(RecordBase):
         }
 
     def __iter__(self):
-        # Sort by whether this is a known field, then its name
-        return iter(sorted(self.fields, key=lambda fd: (int(fd.field is None), fd.name)))
+        # Known fields first, then unknown ones, each sorted by name. Two sorts
+        # with a C-level key beat one sort calling a Python key per field
+        known = sorted([f for f in self.fields if f.field], key=_field_data_name)
+        known.extend(sorted([f for f in self.fields if not f.field], key=_field_data_name))
+        return iter(known)
 
     def __repr__(self):
         return '<DataMessage: %s (#%d) -- local mesg: #%d, fields: [%s]>' % (
@@ -157,38 +227,77 @@ class DataMessage(RecordBase):
 
 
 class FieldData(RecordBase):
-    __slots__ = ('field_def', 'field', 'parent_field', 'value', 'raw_value', 'units')
+    __slots__ = ('_field_def', '_field', '_parent_field', 'value', 'raw_value', 'units',
+                 'name', 'def_num', 'type', '_names')
 
-    def __init__(self, *args, **kwargs):
-        super().__init__(self, *args, **kwargs)
-        if not self.units and self.field:
+    def __init__(self, field_def=None, field=None, parent_field=None, value=None, raw_value=None, units=None):
+        self._field_def, self._field, self._parent_field = field_def, field, parent_field
+        self.value, self.raw_value = value, raw_value
+        if not units and field:
             # Default to units on field, otherwise None.
             # NOTE:Not a property since you may want to override this in a data processor
-            self.units = self.field.units
+            units = field.units
+        self.units = units
+        self._refresh()
+
+    def _refresh(self):
+        # name, def_num and type aren't properties, since the data processors
+        # read them for every field. They're derived again whenever field or
+        # field_def are set. Prefer the field's def_num since field_def may be
+        # None if this field is dynamic
+        field = self._field
+        if field:
+            self.name, self.def_num, self.type = field.name, field.def_num, field.type
+        else:
+            self.def_num = self._field_def.def_num
+            self.name = _UNKNOWN_NAMES[self.def_num]
+            self.type = self._field_def.base_type
+        self._names = None
 
     @property
-    def name(self):
-        return self.field.name if self.field else 'unknown_%d' % self.def_num
+    def field_def(self):
+        return self._field_def
 
-    # TODO: Some notion of flags
+    @field_def.setter
+    def field_def(self, field_def):
+        self._field_def = field_def
+        self._refresh()
 
-    def is_named(self, name):
-        if self.field:
-            if name in (self.field.name, self.field.def_num):
-                return True
-        if self.parent_field:
-            if name in (self.parent_field.name, self.parent_field.def_num):
-                return True
-        if self.field_def:
-            if name == self.field_def.def_num:
-                return True
-        return False
+    @property
+    def field(self):
+        return self._field
+
+    @field.setter
+    def field(self, field):
+        self._field = field
+        self._refresh()
 
     @property
-    def def_num(self):
-        # Prefer to return the def_num on the field
-        # since field_def may be None if this field is dynamic
-        return self.field.def_num if self.field else self.field_def.def_num
+    def parent_field(self):
+        return self._parent_field
+
+    @parent_field.setter
+    def parent_field(self, parent_field):
+        self._parent_field = parent_field
+        self._names = None
+
+    # TODO: Some notion of flags
+
+    @property
+    def names(self):
+        # Every name and def_num this field can be looked up by
+        if self._names is None:
+            names = []
+            for field in (self._field, self._parent_field):
+                if field:
+                    names.extend((field.name, field.def_num))
+            if self._field_def:
+                names.append(self._field_def.def_num)
+            self._names = frozenset(names)
+        return self._names
+
+    def is_named(self, name):
+        return name in self.names
 
     @property
     def base_type(self):
@@ -200,10 +309,6 @@ class FieldData(RecordBase):
     def is_base_type(self):
         return self.field.is_base_type if self.field else True
 
-    @property
-    def type(self):
-        return self.field.type if self.field else self.base_type
-
     @property
     def field_type(self):
         return self.field.field_type if self.field else 'field'
@@ -228,16 +333,48 @@ class FieldData(RecordBase):
 
 
 class BaseType(RecordBase):
-    __slots__ = ('name', 'identifier', 'fmt', 'parse')
+    __slots__ = ('name', 'identifier', 'fmt', 'parse', 'invalid', 'size', 'type_num', 'structs')
     values = None  # In case we're treated as a FieldType
 
-    @property
-    def size(self):
-        return struct.calcsize(self.fmt)
+    def __init__(self, *args, **kwargs):
+        self._init_slots(*args, **kwargs)
+        # Consulted for every field of every definition and data message,
+        # so compute it once rather than on each access
+        self.size = struct.calcsize(self.fmt)
+        self.type_num = self.identifier & 0x1F
+        if self.parse is None:
+            self.parse = self._make_parse(self.invalid)
+        # Compiled structs, keyed by (endian, count). See get_struct()
+        self.structs = {}
 
-    @property
-    def type_num(self):
-        return self.identifier & 0x1F
+    @staticmethod
+    def _make_parse(invalid):
+        # Scalar parser mapping the type's invalid value to None, so it can't
+        # disagree with parse_bulk() and the data message readers
+        if invalid != invalid:
+            # NaN is the only value not equal to itself
+            return lambda x: None if x != x else x
+        return lambda x: None if x == invalid else x
+
+    def get_struct(self, endian, count=1):
+        # Compiled struct to read count values, so the format string doesn't
+        # need to be built and parsed again for each field that's read
+        try:
+            return self.structs[endian, count]
+        except KeyError:
+            compiled = self.structs[endian, count] = struct.Struct('%s%d%s' % (endian, count, self.fmt))
+            return compiled
+
+    def parse_bulk(self, values):
+        # Parse an array of values. Types with an invalid value compare against
+        # it inline rather than calling parse() for each value
+        invalid = self.invalid
+        if invalid is None:
+            return tuple(map(self.parse, values))
+        if invalid != invalid:
+            # NaN is the only value not equal to itself
+            return tuple([None if value != value else value for value in values])
+        return tuple([None if value == invalid else value for value in values])
 
     def __repr__(self):
         return '<BaseType: %s (#%d [0x%X])>' % (
@@ -293,18 +430,19 @@ class DevField(FieldAndSubFieldBase):
     field_type = 'devfield'
 
 
-class ReferenceField(RecordBase):
-    __slots__ = ('name', 'def_num', 'value', 'raw_value')
+class ReferenceField(_record_tuple(
+    'ReferenceField', ('name', 'def_num', 'value', 'raw_value'),
+)):
+    __slots__ = ()
 
 
-class ComponentField(RecordBase):
-    __slots__ = ('name', 'def_num', 'scale', 'offset', 'units', 'accumulate', 'bits', 'bit_offset')
+class ComponentField(_record_tuple(
+    'ComponentField', ('name', 'def_num', 'scale', 'offset', 'units', 'accumulate', 'bits', 'bit_offset'),
+)):
+    __slots__ = ()
     field_type = 'component'
 
     def render(self, raw_value):
-        if raw_value is None:
-            return None
-
         # If it's a tuple, then it's a byte array and unpack it as such
         # (only type that uses this is compressed speed/distance)
         if isinstance(raw_value, tuple):
@@ -316,19 +454,42 @@ class ComponentField(RecordBase):
             if self.bit_offset and self.bit_offset >= len(raw_value) << 3:
                 raise ValueError()
 
-            unpacked_num = 0
+            try:
+                # Unpack byte array as little endian
+                raw_value = int.from_bytes(bytes(raw_value), 'little')
+            except ValueError:
+                # Arrays of wider base types don't fit in bytes, so shift
+                # each value in a byte at a time
+                unpacked_num = 0
+                for value in reversed(raw_value):
+                    unpacked_num = (unpacked_num << 8) + value
+                raw_value = unpacked_num
+        elif not isinstance(raw_value, int):
+            # Nothing to extract from (including None)
+            return raw_value
 
-            # Unpack byte array as little endian
-            for value in reversed(raw_value):
-                unpacked_num = (unpacked_num << 8) + value
+        # Mask and shift like a normal number
+        return (raw_value >> self.bit_offset) & ((1 << self.bits) - 1)
 
-            raw_value = unpacked_num
 
-        # Mask and shift like a normal number
-        if isinstance(raw_value, int):
-            raw_value = (raw_value >> self.bit_offset) & ((1 << self.bits) - 1)
+def _make_crc_byte_table(nibble_table):
+    # Expand the SDK's per-nibble table into a per-byte one, ie. the CRC
+    # of every single byte value starting from a zero CRC
+    table = []
+    for byte in range(256):
+        crc = 0
+        for nibble in (byte & 0xF, byte >> 4):
+            tmp = nibble_table[crc & 0xF]
+            crc = (crc >> 4) & 0x0FFF
+            crc = crc ^ tmp ^ nibble_table[nibble]
+        table.append(crc)
+    return tuple(table)
 
-        return raw_value
+
+def _make_crc_word_table(byte_table):
+    # CRC of every byte value followed by a zero byte, so two bytes can be
+    # folded in with one lookup each (slice-by-2)
+    return tuple((crc >> 8) ^ byte_table[crc & 0xFF] for crc in byte_table)
 
 
 class Crc:
@@ -339,6 +500,10 @@ class Crc:
         0xA001, 0x6C00, 0x7800, 0xB401, 0x5000, 0x9C01, 0x8801, 0x4400,
     )
 
+    # One lookup per byte instead of two rounds per byte with CRC_TABLE
+    CRC_BYTE_TABLE = _make_crc_byte_table(CRC_TABLE)
+    CRC_WORD_TABLE = _make_crc_word_table(CRC_BYTE_TABLE)
+
     FMT = 'H'
 
     def __init__(self, value=0, byte_arr=None):
@@ -364,55 +529,65 @@ class Crc:
 
     @classmethod
     def calculate(cls, byte_arr, crc=0):
-        """Compute CRC for input bytes."""
-        for byte in byte_arr:
-            # Taken verbatim from FIT SDK docs
-            tmp = cls.CRC_TABLE[crc & 0xF]
-            crc = (crc >> 4) & 0x0FFF
-            crc = crc ^ tmp ^ cls.CRC_TABLE[byte & 0xF]
-
-            tmp = cls.CRC_TABLE[crc & 0xF]
-            crc = (crc >> 4) & 0x0FFF
-            crc = crc ^ tmp ^ cls.CRC_TABLE[(byte >> 4) & 0xF]
+        """Compute CRC for input bytes or any other iterable of byte values."""
+        byte_table = cls.CRC_BYTE_TABLE
+        if not isinstance(byte_arr, (bytes, bytearray)) or len(byte_arr) < 32:
+            # Most reads while decoding are a few bytes, where unpacking
+            # words costs more than it saves. Anything that isn't a bytes
+            # buffer can't be unpacked as words at all
+            for byte in byte_arr:
+                crc = (crc >> 8) ^ byte_table[(crc ^ byte) & 0xFF]
+            return crc
+
+        # Fold in two bytes per iteration
+        word_table = cls.CRC_WORD_TABLE
+        for word in struct.unpack_from('<%dH' % (len(byte_arr) >> 1), byte_arr):
+            crc ^= word
+            crc = word_table[crc & 0xFF] ^ byte_table[crc >> 8]
+        if len(byte_arr) & 1:
+            crc = (crc >> 8) ^ byte_table[(crc ^ byte_arr[-1]) & 0xFF]
         return crc
 
 
 def parse_string(string):
-    try:
-        s = string[:string.index(0x00)]
-    except ValueError:
-        # FIT specification defines the 'string' type as follows: "Null
-        # terminated string encoded in UTF-8 format".
-        #
-        # However 'string' values are not always null-terminated when encoded,
-        # according to FIT files created by Garmin devices (e.g. DEVICE.FIT file
-        # from a fenix3).
-        #
-        # So in order to be more flexible, in case index() could not find any
-        # null byte, we just decode the whole bytes-like object.
-        s = string
-
-    return s.decode(encoding='utf-8', errors='replace') or None
+    # FIT specification defines the 'string' type as follows: "Null
+    # terminated string encoded in UTF-8 format".
+    #
+    # However 'string' values are not always null-terminated when encoded,
+    # according to FIT files created by Garmin devices (e.g. DEVICE.FIT file
+    # from a fenix3).
+    #
+    # So in order to be more flexible, in case there isn't any null byte, we
+    # just decode the whole bytes-like object.
+    return string.partition(b'\x00')[0].decode('utf-8', 'replace') or None
 
 # The default base type
 BASE_TYPE_BYTE = BaseType(name='byte', identifier=0x0D, fmt='B', parse=lambda x: None if all(b == 0xFF for b in x) else x)
 
 BASE_TYPES = {
-    0x00: BaseType(name='enum', identifier=0x00, fmt='B', parse=lambda x: None if x == 0xFF else x),
-    0x01: BaseType(name='sint8', identifier=0x01, fmt='b', parse=lambda x: None if x == 0x7F else x),
-    0x02: BaseType(name='uint8', identifier=0x02, fmt='B', parse=lambda x: None if x == 0xFF else x),
-    0x83: BaseType(name='sint16', identifier=0x83, fmt='h', parse=lambda x: None if x == 0x7FFF else x),
-    0x84: BaseType(name='uint16', identifier=0x84, fmt='H', parse=lambda x: None if x == 0xFFFF else x),
-    0x85: BaseType(name='sint32', identifier=0x85, fmt='i', parse=lambda x: None if x == 0x7FFFFFFF else x),
-    0x86: BaseType(name='uint32', identifier=0x86, fmt='I', parse=lambda x: None if x == 0xFFFFFFFF else x),
+    0x00: BaseType(name='enum', identifier=0x00, fmt='B', invalid=0xFF),
+    0x01: BaseType(name='sint8', identifier=0x01, fmt='b', invalid=0x7F),
+    0x02: BaseType(name='uint8', identifier=0x02, fmt='B', invalid=0xFF),
+    0x83: BaseType(name='sint16', identifier=0x83, fmt='h', invalid=0x7FFF),
+    0x84: BaseType(name='uint16', identifier=0x84, fmt='H', invalid=0xFFFF),
+    0x85: BaseType(name='sint32', identifier=0x85, fmt='i', invalid=0x7FFFFFFF),
+    0x86: BaseType(name='uint32', identifier=0x86, fmt='I', invalid=0xFFFFFFFF),
     0x07: BaseType(name='string', identifier=0x07, fmt='s', parse=parse_string),
-    0x88: BaseType(name='float32', identifier=0x88, fmt='f', parse=lambda x: None if math.isnan(x) else x),
-    0x89: BaseType(name='float64', identifier=0x89, fmt='d', parse=lambda x: None if math.isnan(x) else x),
-    0x0A: BaseType(name='uint8z', identifier=0x0A, fmt='B', parse=lambda x: None if x == 0x0 else x),
-    0x8B: BaseType(name='uint16z', identifier=0x8B, fmt='H', parse=lambda x: None if x == 0x0 else x),
-    0x8C: BaseType(name='uint32z', identifier=0x8C, fmt='I', parse=lambda x: None if x == 0x0 else x),
+    0x88: BaseType(name='float32', identifier=0x88, fmt='f', invalid=math.nan),
+    0x89: BaseType(name='float64', identifier=0x89, fmt='d', invalid=math.nan),
+    0x0A: BaseType(name='uint8z', identifier=0x0A, fmt='B', invalid=0x0),
+    0x8B: BaseType(name='uint16z', identifier=0x8B, fmt='H', invalid=0x0),
+    0x8C: BaseType(name='uint32z', identifier=0x8C, fmt='I', invalid=0x0),
     0x0D: BASE_TYPE_BYTE,
-    0x8E: BaseType(name='sint64', identifier=0x8E, fmt='q', parse=lambda x: None if x == 0x7FFFFFFFFFFFFFFF else x),
-    0x8F: BaseType(name='uint64', identifier=0x8F, fmt='Q', parse=lambda x: None if x == 0xFFFFFFFFFFFFFFFF else x),
-    0x90: BaseType(name='uint64z', identifier=0x90, fmt='Q', parse=lambda x: None if x == 0 else x),
+    0x8E: BaseType(name='sint64', identifier=0x8E, fmt='q', invalid=0x7FFFFFFFFFFFFFFF),
+    0x8F: BaseType(name='uint64', identifier=0x8F, fmt='Q', invalid=0xFFFFFFFFFFFFFFFF),
+    0x90: BaseType(name='uint64z', identifier=0x90, fmt='Q', invalid=0),
 }
+
+# BASE_TYPES indexed by base type number (identifier & 0x1F), so lookups are a
+# tuple subscript instead of hashing. Callers must check the identifier of the
+# base type found, since other bytes share the same number
+BASE_TYPES_BY_NUM = tuple(
+    next((bt for bt in BASE_TYPES.values() if bt.type_num == type_num), None)
+    for type_num in range(0x20)
+)
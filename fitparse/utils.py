@@ -64,4 +64,7 @@ def is_iterable(obj):
     """Check, if the obj is iterable but not string or bytes.
     :rtype bool"""
     # Speed: do not use iter() although it's more robust, see also https://stackoverflow.com/questions/1952464/
-    return isinstance(obj, Iterable) and not isinstance(obj, (str, bytes))
+    # Rule out the common scalar values before the slower Iterable ABC check
+    if obj is None or isinstance(obj, (int, float, str, bytes)):
+        return False
+    return isinstance(obj, Iterable)
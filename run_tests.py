@@ -1,12 +1,7 @@
 #!/usr/bin/env python
 
 import os
-import sys
-
-if sys.version_info >= (2, 7):
-    import unittest
-else:
-    import unittest2 as unittest
+import unittest
 
 
 TEST_PATH = os.path.join(os.path.realpath(os.path.dirname(__file__)), 'tests')
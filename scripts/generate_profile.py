@@ -1,4 +1,4 @@
-#!/usr/bin/env python
+#!/usr/bin/env python3
 
 #
 # Horrible, dirty, ugly, awful, and terrible script to export the Profile.xls
@@ -12,6 +12,7 @@
 
 from collections import namedtuple
 import datetime
+import functools
 import os
 import re
 import sys
@@ -101,29 +102,41 @@ def indent(s, amount=1):
     return ('\n%s' % (' ' * (amount * 4))).join(str(s).splitlines())
 
 
-class TypeList(namedtuple('TypeList', ('types'))):
+class TypeList(namedtuple('TypeList', ('types', 'types_by_name', 'mesg_nums'))):
+    # types_by_name and mesg_nums index types and mesg_num values by name as
+    # they're added, keeping the first one if a name is repeated
+
+    def add_type(self, type):
+        self.types.append(type)
+        self.types_by_name.setdefault(type.name, type)
+
+    def add_value(self, type, value):
+        type.values.append(value)
+        if type.name == 'mesg_num':
+            self.mesg_nums.setdefault(value.name, value.value)
+
     def get(self, name, raise_exception=True):
-        for type in self.types:
-            if type.name == name:
-                return type
-        if raise_exception:
+        type = self.types_by_name.get(name)
+        if type is None and raise_exception:
             raise AssertionError("Couldn't find type by name: %s" % name)
+        return type
 
     def num_values(self):
         return sum(len(type.values) for type in self.types)
 
     def get_mesg_num(self, name):
-        for mesg in self.get('mesg_num').values:
-            if mesg.name == name:
-                return mesg.value
-        raise AssertionError("Couldn't find message by name: %s" % name)
+        try:
+            return self.mesg_nums[name]
+        except KeyError:
+            raise AssertionError("Couldn't find message by name: %s" % name) from None
 
     def __str__(self):
-        s = 'FIELD_TYPES = {\n'
+        # Collect the parts and join once, the output is the bulk of profile.py
+        parts = ['FIELD_TYPES = {\n']
         for type in sorted(self.types, key=lambda x: x.name):
-            s += "    '{}': {},\n".format(type.name, indent(type))
-        s += '}'
-        return s
+            parts.append("    '{}': {},\n".format(type.name, indent(type)))
+        parts.append('}')
+        return ''.join(parts)
 
 
 class TypeInfo(namedtuple('TypeInfo', ('name', 'base_type', 'values', 'comment'))):
@@ -134,18 +147,20 @@ class TypeInfo(namedtuple('TypeInfo', ('name', 'base_type', 'values', 'comment')
         raise AssertionError("Invalid value name {} in type {}".format(value_name, self.name))
 
     def __str__(self):
-        s = 'FieldType(%s\n' % render_comment(self.comment)
-        s += "    name='%s',\n" % (self.name)
-        s += "    base_type=BASE_TYPES[{}],  # {}\n".format(
+        parts = ['FieldType(%s\n' % render_comment(self.comment)]
+        parts.append("    name='%s',\n" % (self.name))
+        parts.append("    base_type=BASE_TYPES[{}],  # {}\n".format(
             BASE_TYPES[self.base_type], self.base_type,
-        )
+        ))
         if self.values:
-            s += "    values={\n"
-            for value in sorted(self.values, key=lambda x: x.value if isinstance(x.value, int) else int(x.value, 16)):
-                s += "        {}\n".format(value)
-            s += "    },\n"
-        s += ")"
-        return s
+            parts.append("    values={\n")
+            parts.append(''.join(
+                "        {}\n".format(value)
+                for value in sorted(self.values, key=lambda x: x.value if isinstance(x.value, int) else int(x.value, 16))
+            ))
+            parts.append("    },\n")
+        parts.append(")")
+        return ''.join(parts)
 
 
 class TypeValueInfo(namedtuple('TypeValueInfo', ('name', 'value', 'comment'))):
@@ -153,26 +168,26 @@ class TypeValueInfo(namedtuple('TypeValueInfo', ('name', 'value', 'comment'))):
         return "{}: '{}',{}".format(self.value, self.name, render_comment(self.comment))
 
 
+def message_sort_key(message):
+    # Common messages first, then by group name and message number
+    group_name = message.group_name.lower()
+    return (0 if group_name.startswith('common') else 1, group_name, message.num)
+
+
 class MessageList(namedtuple('MessageList', ('messages'))):
     def __str__(self):
-        s = 'MESSAGE_TYPES = {\n'
+        parts = ['MESSAGE_TYPES = {\n']
         last_group_name = None
-        for message in sorted(
-            self.messages,
-            key=lambda mi: (
-                0 if mi.group_name.lower().startswith('common') else 1,
-                mi.group_name.lower(), mi.num,
-            ),
-        ):
+        for message in sorted(self.messages, key=message_sort_key):
             # Group name comment
             if message.group_name != last_group_name:
                 if last_group_name is not None:
-                    s += '\n\n'
-                s += "%s\n" % header(message.group_name, 4)
+                    parts.append('\n\n')
+                parts.append("%s\n" % header(message.group_name, 4))
                 last_group_name = message.group_name
-            s += "    {}: {},\n".format(message.num, indent(message))
-        s += '}'
-        return s
+            parts.append("    {}: {},\n".format(message.num, indent(message)))
+        parts.append('}')
+        return ''.join(parts)
 
     def get_by_name(self, mesg_name):
         for mesg in self.messages:
@@ -191,24 +206,31 @@ class MessageList(namedtuple('MessageList', ('messages'))):
         raise ValueError('field "{}" not found in message "{}"'.format(field_name, mesg_name))
 
 
-class MessageInfo(namedtuple('MessageInfo', ('name', 'num', 'group_name', 'fields', 'comment'))):
+class MessageInfo(namedtuple('MessageInfo', ('name', 'num', 'group_name', 'fields', 'fields_by_name', 'comment'))):
+    def add_field(self, field):
+        # Index by name as fields are added, keeping the first of a name
+        self.fields.append(field)
+        self.fields_by_name.setdefault(field.name, field)
+
     def get(self, field_name):
-        for field in self.fields:
-            if field.name == field_name:
-                return field
-        raise AssertionError("Invalid field name {} in message {}".format(field_name, self.name))
+        try:
+            return self.fields_by_name[field_name]
+        except KeyError:
+            raise AssertionError("Invalid field name {} in message {}".format(field_name, self.name)) from None
 
     def __str__(self):
-        s = "MessageType(%s\n" % render_comment(self.comment)
-        s += "    name='%s',\n" % self.name
-        s += "    mesg_num=%d,\n" % self.num
-        s += "    fields={\n"
-        for field in sorted(self.fields, key=lambda fi: fi.num):
-            # Don't include trailing comma for fields
-            s += "        %d: %s\n" % (field.num, indent(field, 2))
-        s += "    },\n"
-        s += ")"
-        return s
+        parts = ["MessageType(%s\n" % render_comment(self.comment)]
+        parts.append("    name='%s',\n" % self.name)
+        parts.append("    mesg_num=%d,\n" % self.num)
+        parts.append("    fields={\n")
+        # Don't include trailing comma for fields
+        parts.append(''.join(
+            "        %d: %s\n" % (field.num, indent(field, 2))
+            for field in sorted(self.fields, key=lambda fi: fi.num)
+        ))
+        parts.append("    },\n")
+        parts.append(")")
+        return ''.join(parts)
 
 
 class FieldInfo(namedtuple('FieldInfo', ('name', 'type', 'num', 'scale', 'offset', 'units', 'components', 'subfields', 'comment'))):
@@ -217,84 +239,87 @@ class FieldInfo(namedtuple('FieldInfo', ('name', 'type', 'num', 'scale', 'offset
             # Add trailing comma here because of comment
             assert not self.components and not self.subfields
             return 'FIELD_TYPE_TIMESTAMP,%s' % render_comment(self.comment)
-        s = "Field(%s\n" % render_comment(self.comment)
-        s += "    name='%s',\n" % self.name
-        s += "    type=%s\n" % render_type(self.type)
-        s += "    def_num=%d,\n" % self.num
+        parts = ["Field(%s\n" % render_comment(self.comment)]
+        parts.append("    name='%s',\n" % self.name)
+        parts.append("    type=%s\n" % render_type(self.type))
+        parts.append("    def_num=%d,\n" % self.num)
         if self.scale:
-            s += "    scale=%s,\n" % self.scale
+            parts.append("    scale=%s,\n" % self.scale)
         if self.offset:
-            s += "    offset=%s,\n" % self.offset
+            parts.append("    offset=%s,\n" % self.offset)
         if self.units:
-            s += "    units=%s,\n" % repr(self.units)
+            parts.append("    units=%s,\n" % repr(self.units))
         if self.components:
-            s += '    components=(\n'
+            parts.append('    components=(\n')
             # Leave components sorted as is (order matters because of bit layout)
             for component in self.components:
-                s += "        %s,\n" % indent(component, 2)
-            s += "    ),\n"
+                parts.append("        %s,\n" % indent(component, 2))
+            parts.append("    ),\n")
         if self.subfields:
-            s += "    subfields=(\n"
+            parts.append("    subfields=(\n")
             for subfield in sorted(self.subfields, key=lambda si: si.name):
-                s += "        %s,\n" % indent(subfield, 2)
-            s += "    ),\n"
-        s += "),"
-        return s
+                parts.append("        %s,\n" % indent(subfield, 2))
+            parts.append("    ),\n")
+        parts.append("),")
+        return ''.join(parts)
 
 
 class ComponentFieldInfo(namedtuple('ComponentFieldInfo', ('name', 'num', 'scale', 'offset', 'units', 'bits', 'bit_offset', 'accumulate'))):
     def __str__(self):
-        s = "ComponentField(\n"
-        s += "    name='%s',\n" % self.name
-        s += "    def_num=%d,\n" % (self.num if self.num is not None else 0)
+        parts = ["ComponentField(\n"]
+        parts.append("    name='%s',\n" % self.name)
+        parts.append("    def_num=%d,\n" % (self.num if self.num is not None else 0))
         if self.scale:
-            s += "    scale=%s,\n" % self.scale
+            parts.append("    scale=%s,\n" % self.scale)
         if self.offset:
-            s += "    offset=%s,\n" % self.offset
+            parts.append("    offset=%s,\n" % self.offset)
         if self.units:
-            s += "    units=%s,\n" % repr(self.units)
-        s += "    accumulate=%s,\n" % self.accumulate
-        s += "    bits=%s,\n" % self.bits
-        s += "    bit_offset=%s,\n" % self.bit_offset
-        s += ")"
-        return s
+            parts.append("    units=%s,\n" % repr(self.units))
+        parts.append("    accumulate=%s,\n" % self.accumulate)
+        parts.append("    bits=%s,\n" % self.bits)
+        parts.append("    bit_offset=%s,\n" % self.bit_offset)
+        parts.append(")")
+        return ''.join(parts)
 
 
 class SubFieldInfo(namedtuple('SubFieldInfo', ('name', 'num', 'type', 'scale', 'offset', 'units', 'ref_fields', 'components', 'comment'))):
     def __str__(self):
-        s = "SubField(%s\n" % render_comment(self.comment)
-        s += "    name='%s',\n" % self.name
-        s += "    def_num=%s,\n" % self.num
-        s += "    type=%s\n" % render_type(self.type)
+        parts = ["SubField(%s\n" % render_comment(self.comment)]
+        parts.append("    name='%s',\n" % self.name)
+        parts.append("    def_num=%s,\n" % self.num)
+        parts.append("    type=%s\n" % render_type(self.type))
         if self.scale:
-            s += "    scale=%s,\n" % self.scale
+            parts.append("    scale=%s,\n" % self.scale)
         if self.offset:
-            s += "    offset=%s,\n" % self.offset
+            parts.append("    offset=%s,\n" % self.offset)
         if self.units:
-            s += "    units=%s,\n" % repr(self.units)
-        s += "    ref_fields=(\n"
+            parts.append("    units=%s,\n" % repr(self.units))
+        parts.append("    ref_fields=(\n")
         for ref_field in self.ref_fields:  # sorted(self.ref_fields, key=lambda rf: (rf.name, rf.value)):
-            s += "        %s,\n" % indent(ref_field, 2)
-        s += "    ),\n"
+            parts.append("        %s,\n" % indent(ref_field, 2))
+        parts.append("    ),\n")
         if self.components:
-            s += '    components=(\n'
+            parts.append('    components=(\n')
             # Leave components sorted as is (order matters because of bit layout)
             for component in self.components:
-                s += "        %s,\n" % indent(component, 2)
-            s += "    ),\n"
-        s += ")"
-        return s
+                parts.append("        %s,\n" % indent(component, 2))
+            parts.append("    ),\n")
+        parts.append(")")
+        return ''.join(parts)
+
+
+REFERENCE_FIELD_TEMPLATE = """ReferenceField(
+    name='%s',
+    def_num=%d,
+    value='%s',
+    raw_value=%d,
+)"""
 
 
 class ReferenceFieldInfo(namedtuple('ReferenceFieldInfo', ('name', 'value', 'num', 'raw_value'))):
     def __str__(self):
-        s = 'ReferenceField(\n'
-        s += "    name='%s',\n" % self.name
-        s += '    def_num=%d,\n' % self.num
-        s += "    value='%s',\n" % self.value
-        s += '    raw_value=%d,\n' % self.raw_value
-        s += ')'
-        return s
+        # Every attribute is always rendered, so use a single template
+        return REFERENCE_FIELD_TEMPLATE % (self.name, self.num, self.value, self.raw_value)
 
 
 def render_comment(comment):
@@ -318,11 +343,18 @@ def fix_units(data):
     return data
 
 
+@functools.lru_cache(maxsize=None)
+def split_csv_field(data):
+    # The same few strings (units, scales, bits) repeat across the sheet
+    values = (x.strip() for x in data.strip().split(','))
+    return tuple(int(x) if x.isdigit() else x for x in values)
+
+
 def parse_csv_fields(data, num_expected):
     if data is None or data == '':
         return [None] * num_expected
     elif isinstance(data, str):
-        ret = [(int(x.strip()) if x.strip().isdigit() else x.strip()) for x in data.strip().split(',')]
+        ret = list(split_csv_field(data))
     else:
         ret = [data]
 
@@ -332,48 +364,50 @@ def parse_csv_fields(data, num_expected):
     return ret
 
 
+def parse_cell_value(value):
+    if isinstance(value, str):
+        # Use strings for now. Unicode is wonky
+        value = value.strip().encode('ascii', 'ignore')
+        if value == '':
+            value = None
+    elif isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return value
+
+
 def parse_spreadsheet(xls_file, *sheet_names):
+    # Only load the sheets that are asked for, one at a time
     if isinstance(xls_file, str):
-        workbook = xlrd.open_workbook(xls_file)
+        workbook = xlrd.open_workbook(xls_file, on_demand=True)
     else:
-        workbook = xlrd.open_workbook(file_contents=xls_file.read())
+        workbook = xlrd.open_workbook(file_contents=xls_file.read(), on_demand=True)
 
     for sheet_name in sheet_names:
         sheet = workbook.sheet_by_name(sheet_name)
 
         parsed_values = []
 
+        # Only care about the first 14 columns for Messages, so have xlrd
+        # skip the rest rather than slicing each full row
+        end_colx = 14 if sheet_name.lower() == 'messages' else None
+
         # Strip sheet header
         for n in range(1, sheet.nrows):
-            values = []
-
-            row_values = sheet.row_values(n)
-            if sheet_name.lower() == 'messages':
-                # Only care about the first 14 rows for Messages
-                row_values = row_values[:14]
-
-            for value in row_values:
-                if isinstance(value, str):
-                    # Use strings for now. Unicode is wonky
-                    value = value.strip().encode('ascii', 'ignore')
-                    if value == '':
-                        value = None
-                if isinstance(value, float):
-                    if value.is_integer():
-                        value = int(value)
-
-                values.append(value)
+            values = list(map(parse_cell_value, sheet.row_values(n, 0, end_colx)))
 
             if all(v is None for v in values):
                 continue
 
             parsed_values.append(values)
 
+        workbook.unload_sheet(sheet_name)
         yield parsed_values
 
+    workbook.release_resources()
+
 
 def parse_types(types_rows):
-    type_list = TypeList([])
+    type_list = TypeList([], {}, {})
 
     for row in types_rows:
         if row[0]:
@@ -381,7 +415,7 @@ def parse_types(types_rows):
             type = TypeInfo(
                 name=row[0].decode(), base_type=row[1].decode(), values=[], comment=row[4].decode(),
             )
-            type_list.types.append(type)
+            type_list.add_type(type)
             assert type.name
             assert type.base_type
 
@@ -392,11 +426,11 @@ def parse_types(types_rows):
             if value.name and value.value is not None:
                 # Don't add ignore keyed types
                 if "{}:{}".format(type.name, value.name) not in IGNORE_TYPE_VALUES:
-                    type.values.append(value)
+                    type_list.add_value(type, value)
 
     # Add missing boolean type if it's not there
     if not type_list.get('bool', raise_exception=False):
-        type_list.types.append(TypeInfo('bool', 'enum', [], None))
+        type_list.add_type(TypeInfo('bool', 'enum', [], None))
 
     return type_list
 
@@ -420,7 +454,7 @@ def parse_messages(messages_rows, type_list):
             name = row[0].decode()
             message = MessageInfo(
                 name=name, num=type_list.get_mesg_num(name),
-                group_name=group_name, fields=[], comment=row[13].decode(),
+                group_name=group_name, fields=[], fields_by_name={}, comment=row[13].decode(),
             )
             message_list.messages.append(message)
         else:
@@ -470,7 +504,7 @@ def parse_messages(messages_rows, type_list):
                     if row[6] is None or row[6] == b'' or not str(row[6]).isdigit():
                         field = field._replace(scale=None, offset=None, units=None)
 
-                message.fields.append(field)
+                message.add_field(field)
             elif row[2] != b'':
                 # Sub fields
                 subfield = SubFieldInfo(
@@ -546,11 +580,15 @@ def get_xls_and_version_from_zip(path):
 
 def main(input_xls_or_zip, output_py_path=None):
     if output_py_path and os.path.exists(output_py_path):
-        if not open(output_py_path).read().strip().startswith(PROFILE_HEADER_FIRST_PART):
-            print("Python file doesn't begin with appropriate header. Exiting.")
-            sys.exit(1)
-
-    if open(input_xls_or_zip, 'rb').read().startswith(XLS_HEADER_MAGIC):
+        with open(output_py_path) as output_py_file:
+            if not output_py_file.read().strip().startswith(PROFILE_HEADER_FIRST_PART):
+                print("Python file doesn't begin with appropriate header. Exiting.")
+                sys.exit(1)
+
+    # Only the magic is needed to tell a spreadsheet from an SDK zip
+    with open(input_xls_or_zip, 'rb') as input_file:
+        is_xls = input_file.read(len(XLS_HEADER_MAGIC)) == XLS_HEADER_MAGIC
+    if is_xls:
         xls_file, profile_version = input_xls_or_zip, None
     else:
         xls_file, profile_version = get_xls_and_version_from_zip(input_xls_or_zip)
@@ -580,7 +618,7 @@ def main(input_xls_or_zip, output_py_path=None):
 
         field_num_declarations.append(field_decl)
 
-    output = '\n'.join([
+    output = ['\n'.join([
         "\n%s" % PROFILE_HEADER_FIRST_PART,
         header('EXPORTED PROFILE FROM {} ON {}'.format(
             ('SDK VERSION %s' % profile_version) if profile_version else 'SPREADSHEET',
@@ -591,29 +629,31 @@ def main(input_xls_or_zip, output_py_path=None):
             len(message_list.messages), sum(len(mi.fields) for mi in message_list.messages),
         )),
         '', IMPORT_HEADER
-    ]) + '\n'
+    ]), '\n']
 
     if mesg_num_declarations:
-        output += '\n\n' + '\n'.join(mesg_num_declarations) + '\n'
+        output.extend(('\n\n', '\n'.join(mesg_num_declarations), '\n'))
     if field_num_declarations:
-        output += '\n\n' + '\n'.join(field_num_declarations) + '\n'
+        output.extend(('\n\n', '\n'.join(field_num_declarations), '\n'))
 
-    output += '\n\n' + '\n'.join([
+    output.extend(('\n\n', '\n'.join([
         str(type_list), '\n',
         SPECIAL_FIELD_DECLARATIONS, '\n',
         str(message_list), ''
-    ])
+    ])))
 
     # TODO: Apply an additional layer of monkey patching to match reference/component
     # fields to actual field objects? Would clean up accesses to these
 
     if output_py_path:
-        open(output_py_path, 'w').write(output)
+        # Write the parts as they are, no need to join them into one string first
+        with open(output_py_path, 'w') as output_py_file:
+            output_py_file.writelines(output)
         print('Profile version {} written to {}'.format(
             profile_version if profile_version else '<unknown>',
             output_py_path))
     else:
-        print(output.strip())
+        print(''.join(output).strip())
 
 
 if __name__ == '__main__':
@@ -1,4 +1,4 @@
-#!/usr/bin/env python
+#!/usr/bin/env python3
 
 # Tool for verifying sanity of units in Profile.xls / fitparse/profile.py
 
@@ -12,41 +12,41 @@ from fitparse.utils import scrub_method_name
 
 
 def do_profile_xls():
-    workbook = xlrd.open_workbook(sys.argv[1])
+    # Only the Messages sheet is needed, don't have xlrd parse the others
+    workbook = xlrd.open_workbook(sys.argv[1], on_demand=True)
     sheet = workbook.sheet_by_name('Messages')
 
-    all_unit_values = []
-    for unit_value in sheet.col_values(8):  # Extract unit column values
-        unit_value = unit_value.strip()
-        if unit_value:
-            # Deal with comma separated components
-            unit_values = [v.strip() for v in unit_value.split(',')]
-            all_unit_values.extend(unit_values)
+    # Extract unit column values (skipping the header), splitting comma
+    # separated components
+    all_unit_values = {
+        v.strip()
+        for unit_value in sheet.col_values(8, start_rowx=1) if unit_value.strip()
+        for v in unit_value.split(',')
+    }
 
     print('In Profile.xls:')
-    for unit_value in sorted(set(all_unit_values)):
+    for unit_value in sorted(all_unit_values):
         print(' * %s' % unit_value)
 
 
-def do_fitparse_profile():
-    unit_values = []
+def iter_profile_units():
+    # Units of every field, subfield and component (None if they have none)
     for message_type in MESSAGE_TYPES.values():
         for field in message_type.fields.values():
-            unit_values.append(field.units)
-            if field.components:
-                for component in field.components:
-                    unit_values.append(component.units)
-            if field.subfields:
-                for subfield in field.subfields:
-                    unit_values.append(subfield.units)
-                    if subfield.components:
-                        for component in subfield.components:
-                            unit_values.append(component.units)
-
-    unit_values = filter(None, unit_values)
+            yield field.units
+            for component in field.components or ():
+                yield component.units
+            for subfield in field.subfields or ():
+                yield subfield.units
+                for component in subfield.components or ():
+                    yield component.units
+
+
+def do_fitparse_profile():
+    unit_values = {unit_value for unit_value in iter_profile_units() if unit_value}
 
     print('In fitparse/profile.py:')
-    for unit_value in sorted(set(unit_values)):
+    for unit_value in sorted(unit_values):
         print(' * {} [{}]'.format(
             unit_value,
             scrub_method_name('process_units_%s' % unit_value, convert_units=True)
@@ -3,7 +3,7 @@
 import csv
 import datetime
 import os
-from struct import pack
+from struct import pack, Struct
 import warnings
 
 from fitparse import FitFile
@@ -14,29 +14,31 @@ from fitparse.utils import FitEOFError, FitCRCError, FitHeaderError, FitParseErr
 import unittest
 
 
+BASE_TYPES_BY_NAME = {bt.name: bt for bt in BASE_TYPES.values()}
+
+
 def generate_messages(mesg_num, local_mesg_num, field_defs, endian='<', data=None):
     mesgs = []
     base_type_list = []
+    field_def_values = []
 
-    # definition message, local message num
-    s = pack('<B', 0x40 | local_mesg_num)
-    # reserved byte and endian
-    s += pack('<xB', int(endian == '>'))
-    # global message num, num fields
-    s += pack('%sHB' % endian, mesg_num, len(field_defs))
     for def_num, base_type in field_defs:
-        base_type = [bt for bt in BASE_TYPES.values() if bt.name == base_type][0]
+        base_type = BASE_TYPES_BY_NAME[base_type]
         base_type_list.append(base_type)
-        s += pack('<3B', def_num, base_type.size, base_type.identifier)
+        field_def_values.extend((def_num, base_type.size, base_type.identifier))
 
-    mesgs.append(s)
+    # definition message: local message num, reserved byte and endian, global
+    # message num, num fields, then def num, size and base type of each field
+    mesgs.append(pack(
+        '%sBxBHB%dB' % (endian, len(field_def_values)),
+        0x40 | local_mesg_num, int(endian == '>'), mesg_num, len(field_defs), *field_def_values
+    ))
 
     if data:
+        # Header byte followed by all of the fields, packed at once
+        data_struct = Struct(endian + 'B' + ''.join(base_type.fmt for base_type in base_type_list))
         for mesg_data in data:
-            s = pack('B', local_mesg_num)
-            for value, base_type in zip(mesg_data, base_type_list):
-                s += pack("{}{}".format(endian, base_type.fmt), value)
-            mesgs.append(s)
+            mesgs.append(data_struct.pack(local_mesg_num, *mesg_data))
 
     return b''.join(mesgs)
 
@@ -61,16 +63,33 @@ def generate_fitfile(data=None, endian='<'):
 
     # Prototcol version 1.0, profile version 1.52
     header = pack('<2BHI4s', 14, 16, 152, len(fit_data), b'.FIT')
-    file_data = header + pack('<' + Crc.FMT, Crc.calculate(header)) + fit_data
-    return file_data + pack('<' + Crc.FMT, Crc.calculate(file_data))
+    header_crc = Crc.calculate(header)
+    header += pack('<' + Crc.FMT, header_crc)
+    # The file CRC covers the header and its CRC too, so continue from the
+    # header's CRC rather than scanning the header again
+    file_crc = Crc.calculate(fit_data, Crc.calculate(header[-2:], header_crc))
+    return b''.join((header, fit_data, pack('<' + Crc.FMT, file_crc)))
 
 
 def secs_to_dt(secs):
     return datetime.datetime.utcfromtimestamp(secs + UTC_REFERENCE)
 
 
+# The ANT FIT SDK CSV dumps were made with timestamps in PDT
+CSV_TIMESTAMP_OFFSET = datetime.timedelta(hours=7)
+CSV_TIMESTAMP_FORMAT = "%a %b %d %H:%M:%S PDT %Y"
+
+TEST_FILES_DIR = os.path.join(os.path.dirname(os.path.realpath(__file__)), 'files')
+
+
 def testfile(filename):
-    return os.path.join(os.path.dirname(os.path.realpath(__file__)), 'files', filename)
+    return os.path.join(TEST_FILES_DIR, filename)
+
+
+def read_csv_rows(filename):
+    # Read the whole fixture up front so the file is closed before parsing
+    with open(testfile(filename)) as fp:
+        return iter(list(csv.reader(fp)))
 
 
 class FitFileTestCase(unittest.TestCase):
@@ -102,13 +121,36 @@ class FitFileTestCase(unittest.TestCase):
         for field in ('number', 5):
             self.assertEqual(file_id.get_value(field), None)
 
+    def test_get_after_fields_change(self):
+        f = FitFile(generate_fitfile())
+        file_id = f.messages[0]
+        serial_number = file_id.get('serial_number')
+        self.assertIsNotNone(serial_number)
+
+        file_id.fields.remove(serial_number)
+        self.assertIsNone(file_id.get('serial_number'))
+        file_id.fields = [serial_number]
+        self.assertIs(file_id.get('serial_number'), serial_number)
+        self.assertIsNone(file_id.get('type'))
+
+    def test_unknown_base_type_is_byte(self):
+        # local mesg 1, global mesg 0 (file_id), serial number (def num 3) as
+        # two bytes of a base type that isn't a known identifier, even if its
+        # number (0x82 & 0x1F) is uint8's
+        for base_type_id in (0x04, 0x82):
+            f = FitFile(generate_fitfile(
+                pack('<BxBHB3B', 0x41, 0, 0, 1, 3, 2, base_type_id) + pack('<3B', 1, 1, 2)
+            ))
+            serial_number = f.messages[1].get('serial_number')
+            self.assertEqual(serial_number.base_type.name, 'byte')
+            self.assertEqual(serial_number.raw_value, (1, 2))
+
     def test_basic_file_big_endian(self):
         self.test_basic_file_with_one_record('>')
 
     def test_component_field_accumulaters(self):
         # TODO: abstract CSV parsing
-        csv_fp = open(testfile('compressed-speed-distance-records.csv'))
-        csv_file = csv.reader(csv_fp)
+        csv_file = read_csv_rows('compressed-speed-distance-records.csv')
         next(csv_file)  # Consume header
 
         f = FitFile(testfile('compressed-speed-distance.fit'))
@@ -135,7 +177,6 @@ class FitFileTestCase(unittest.TestCase):
             self.assertAlmostEqual(record.get_value('distance'), float(distance))
 
         self.assertEqual(count, 753)  # TODO: confirm size(records) = size(csv)
-        csv_fp.close()
 
     def test_component_field_resolves_subfield(self):
         fit_data = generate_fitfile(
@@ -253,8 +294,7 @@ class FitFileTestCase(unittest.TestCase):
             'garmin-edge-820-bike-records.csv')
 
     def _csv_test_helper(self, fit_file, csv_file):
-        csv_fp = open(testfile(csv_file))
-        csv_messages = csv.reader(csv_fp)
+        csv_messages = read_csv_rows(csv_file)
         field_names = next(csv_messages)  # Consume header
 
         f = FitFile(testfile(fit_file))
@@ -268,7 +308,7 @@ class FitFileTestCase(unittest.TestCase):
                 fit_value, csv_value = message.get_value(field_name), csv_message[csv_index]
                 if field_name == 'timestamp':
                     # Adjust GMT to PDT and format
-                    fit_value = (fit_value - datetime.timedelta(hours=7)).strftime("%a %b %d %H:%M:%S PDT %Y")
+                    fit_value = (fit_value - CSV_TIMESTAMP_OFFSET).strftime(CSV_TIMESTAMP_FORMAT)
 
                 # Track last valid lat/longs
                 if field_name == 'position_lat':
@@ -313,8 +353,6 @@ class FitFileTestCase(unittest.TestCase):
         except StopIteration:
             pass
 
-        csv_fp.close()
-
     def test_developer_types(self):
         """Test that a file with developer types in it can be parsed"""
         FitFile(testfile('developer-types-sample.fit')).parse()
@@ -375,7 +413,8 @@ class FitFileTestCase(unittest.TestCase):
                   'sample-activity.fit', 'garmin-fenix-5-bike.fit',
                   'garmin-fenix-5-run.fit', 'garmin-fenix-5-walk.fit',
                   'garmin-edge-820-bike.fit', 'null_compressed_speed_dist.fit'):
-            FitFile(testfile(x)).parse()
+            with self.subTest(filename=x):
+                FitFile(testfile(x)).parse()
 
     def test_units_processor(self):
         for x in ('2013-02-06-12-11-14.fit', '2015-10-13-08-43-15.fit',
@@ -389,7 +428,8 @@ class FitFileTestCase(unittest.TestCase):
                   'sample-activity.fit', 'garmin-fenix-5-bike.fit',
                   'garmin-fenix-5-run.fit', 'garmin-fenix-5-walk.fit',
                   'garmin-edge-820-bike.fit'):
-            FitFile(testfile(x), data_processor=StandardUnitsDataProcessor()).parse()
+            with self.subTest(filename=x):
+                FitFile(testfile(x), data_processor=StandardUnitsDataProcessor()).parse()
 
     def test_int_long(self):
         """Test that ints are properly shifted and scaled"""
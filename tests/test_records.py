@@ -1,6 +1,6 @@
 #!/usr/bin/env python
 
-from fitparse.records import Crc
+from fitparse.records import BASE_TYPES, ComponentField, Crc, DataMessage, Field, FieldData, FieldDefinition
 
 import unittest
 
@@ -14,10 +14,101 @@ class RecordsTestCase(unittest.TestCase):
         crc.update(0)
         self.assertEqual(0xace7, crc.value)
 
+    def test_crc_long_input(self):
+        def nibble_crc(byte_arr, crc=0):
+            # Reference implementation taken verbatim from FIT SDK docs
+            for byte in byte_arr:
+                tmp = Crc.CRC_TABLE[crc & 0xF]
+                crc = (crc >> 4) & 0x0FFF
+                crc = crc ^ tmp ^ Crc.CRC_TABLE[byte & 0xF]
+
+                tmp = Crc.CRC_TABLE[crc & 0xF]
+                crc = (crc >> 4) & 0x0FFF
+                crc = crc ^ tmp ^ Crc.CRC_TABLE[(byte >> 4) & 0xF]
+            return crc
+
+        data = bytes(range(256)) * 3
+        for size in (31, 32, 33, 100, 101, len(data)):
+            self.assertEqual(nibble_crc(data[:size]), Crc.calculate(data[:size]))
+            self.assertEqual(nibble_crc(data[:size], 0x1234), Crc.calculate(data[:size], 0x1234))
+
+    def test_crc_input_types(self):
+        for size in (12, 64):
+            data = bytes(range(size))
+            crc = Crc.calculate(data)
+            self.assertEqual(crc, Crc.calculate(bytearray(data)))
+            self.assertEqual(crc, Crc.calculate(memoryview(data)))
+            self.assertEqual(crc, Crc.calculate(list(data)))
+            self.assertEqual(crc, Crc.calculate(iter(data)))
+            with self.assertRaises(TypeError):
+                Crc.calculate(data.decode())
+
     def test_crc_format(self):
         self.assertEqual('0x0000', Crc.format(0))
         self.assertEqual('0x12AB', Crc.format(0x12AB))
 
+    def test_base_type_parse(self):
+        for base_type in BASE_TYPES.values():
+            if base_type.invalid is None:
+                continue
+            self.assertIsNone(base_type.parse(base_type.invalid))
+            self.assertEqual((None, 1), base_type.parse_bulk((base_type.invalid, 1)))
+            self.assertEqual(1, base_type.parse(1))
+        self.assertIsNone(BASE_TYPES[0x88].parse(float('nan')))
+
+    def test_field_definition_repr(self):
+        uint16 = BASE_TYPES[0x84]
+        field_def = FieldDefinition(field=None, def_num=3, base_type=uint16, size=4)
+        self.assertIs(uint16, field_def.type)
+        self.assertEqual(
+            '<FieldDefinition: unknown_3 (#3) -- type: uint16 (uint16), size: 4 bytes>',
+            repr(field_def),
+        )
+
+        field = Field(name='heart_rate', type=BASE_TYPES[0x02], def_num=3)
+        field_def = FieldDefinition(field=field, def_num=3, base_type=BASE_TYPES[0x02], size=1)
+        self.assertIs(field.type, field_def.type)
+        self.assertEqual(
+            '<FieldDefinition: heart_rate (#3) -- type: uint8 (uint8), size: 1 byte>',
+            repr(field_def),
+        )
+
+    def test_records_compare_by_identity(self):
+        field = Field(name='heart_rate', type=BASE_TYPES[0x02], def_num=3, components=[])
+        other = Field(name='heart_rate', type=BASE_TYPES[0x02], def_num=3, components=[])
+        self.assertNotEqual(field, other)
+        self.assertEqual(2, len({field, other}))
+        self.assertEqual(1, len({FieldDefinition(field=field, def_num=3, size=1): field}))
+
+    def test_record_subclass_init(self):
+        class ExtraDataMessage(DataMessage):
+            __slots__ = ('extra',)
+
+        mesg = ExtraDataMessage(fields=[], extra=2)
+        self.assertEqual([], mesg.fields)
+        self.assertEqual(2, mesg.extra)
+        self.assertIsNone(mesg.get('heart_rate'))
+        with self.assertRaises(TypeError):
+            DataMessage(_fields_by_name={})
+
+    def test_field_data_follows_field(self):
+        field_def = FieldDefinition(field=None, def_num=3, base_type=BASE_TYPES[0x02], size=1)
+        field_data = FieldData(field_def=field_def, value=60, raw_value=60)
+        self.assertEqual('unknown_3', field_data.name)
+        self.assertFalse(field_data.is_named('heart_rate'))
+
+        field_data.field = Field(name='heart_rate', type=BASE_TYPES[0x02], def_num=3, units='bpm')
+        self.assertEqual('heart_rate', field_data.name)
+        self.assertEqual(3, field_data.def_num)
+        self.assertTrue(field_data.is_named('heart_rate'))
+
+    def test_component_render_array(self):
+        component = ComponentField(name='speed', def_num=0, bits=12, bit_offset=4)
+        self.assertEqual(0x123, component.render((0x30, 0x12)))
+        # uint16 arrays are shifted in a byte per value, like byte arrays
+        component = ComponentField(name='speed', def_num=0, bits=16, bit_offset=0)
+        self.assertEqual((2 << 8) + 1000, component.render((1000, 2)))
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -11,8 +11,11 @@ from fitparse.utils import fileish_open, is_iterable
 import unittest
 
 
+TEST_FILES_DIR = os.path.join(os.path.dirname(os.path.realpath(__file__)), 'files')
+
+
 def testfile(filename):
-    return os.path.join(os.path.dirname(os.path.realpath(__file__)), 'files', filename)
+    return os.path.join(TEST_FILES_DIR, filename)
 
 
 class UtilsTestCase(unittest.TestCase):